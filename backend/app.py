@@ -4,8 +4,9 @@ app.py
 Flask Web Server for Gemini + Web Search Assistant.
 
 Features:
-- Web UI with Flask templates.
+- Web UI served as a static page with conditional (ETag / 304) responses.
 - /api/chat endpoint for client interactions.
+- /api/chat/stream endpoint streaming tokens as Server-Sent Events.
 - Integrates GeminiClient (AI + DuckDuckGo search).
 - Clean error handling, JSON responses, and logging.
 
@@ -16,31 +17,119 @@ Date: October 2025
 
 import os
 import logging
-from flask import Flask, render_template, request, jsonify
-from flask_cors import CORS
+from functools import lru_cache
+import orjson
+from pythonjsonlogger.json import JsonFormatter
+from flask import Flask, Response, request, send_from_directory, stream_with_context
+from flask_compress import Compress
 from gemini_client import GeminiClient
 
 # -------------------------------------------------------
 # Configuration & Logging
 # -------------------------------------------------------
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(message)s",
-    datefmt="%Y-%m-%d %H:%M:%S"
+_log_handler = logging.StreamHandler()
+_log_handler.setFormatter(
+    JsonFormatter("%(asctime)s %(levelname)s %(message)s", datefmt="%Y-%m-%d %H:%M:%S")
 )
+logging.basicConfig(level=logging.INFO, handlers=[_log_handler])
 logger = logging.getLogger(__name__)
 
 # -------------------------------------------------------
 # Environment Setup
 # -------------------------------------------------------
+# Reject oversized input before it reaches Gemini
+MAX_BODY_BYTES = 16 * 1024
+MAX_MESSAGE_CHARS = 8000
+
+# Allows cross-origin access for frontend apps; fixed for the life of the process
+_CORS_HEADERS = (
+    ("Access-Control-Allow-Origin", os.getenv("CORS_ORIGIN", "*")),
+)
+_CORS_PREFLIGHT_HEADERS = (
+    ("Access-Control-Allow-Methods", "GET, POST, OPTIONS"),
+    ("Access-Control-Allow-Headers", "Content-Type"),
+    ("Access-Control-Max-Age", "86400"),
+)
+
 if not os.getenv("GEMINI_API_KEY"):
     logger.warning("⚠️ GEMINI_API_KEY not found. Please configure it in your .env file.")
 
 app = Flask(__name__, template_folder="../templates", static_folder="../static")
-CORS(app)  # Allows cross-origin access for frontend apps
+app.config["MAX_CONTENT_LENGTH"] = MAX_BODY_BYTES  # Werkzeug rejects larger bodies up front
+# Let a fronting server (Apache mod_xsendfile, lighttpd) send static files itself
+app.config["USE_X_SENDFILE"] = os.getenv("USE_X_SENDFILE", "false").lower() == "true"
+_PAGES_DIR = os.path.abspath(os.path.join(app.root_path, app.template_folder))
+
+# Compress JSON replies and the page, preferring Brotli. SSE is left out: the stream
+# compressors only flush at the end, which would hold back every token until completion.
+# With X-Sendfile the body is sent (and compressed) by the fronting server instead.
+app.config["COMPRESS_MIMETYPES"] = ["application/json"] + ([] if app.config["USE_X_SENDFILE"] else ["text/html"])
+app.config["COMPRESS_MIN_SIZE"] = 512
+app.config["COMPRESS_ALGORITHM"] = ["br", "gzip"]
+app.config["COMPRESS_ALGORITHM_STREAMING"] = ["br", "gzip"]  # send_from_directory streams the page
+app.config["COMPRESS_STREAMING_ENDPOINT_CONDITIONAL"] = ["static", "index"]  # keep 304s for the page
+Compress(app)
+
+# -------------------------------------------------------
+# CORS
+# -------------------------------------------------------
+
+@app.before_request
+def _cors_preflight():
+    """Answer CORS preflight requests directly, before routing."""
+    if request.method == "OPTIONS":
+        resp = Response(status=204)
+        for k, v in _CORS_PREFLIGHT_HEADERS:
+            resp.headers[k] = v
+        return resp
+    return None
+
+
+@app.after_request
+def _cors(resp):
+    """Attach the static CORS headers to every response."""
+    for k, v in _CORS_HEADERS:
+        resp.headers[k] = v
+    resp.vary.add("Origin")  # Merge rather than overwrite other Vary values
+    return resp
+
+
+# -------------------------------------------------------
+# Helpers
+# -------------------------------------------------------
+
+@lru_cache(maxsize=1)
+def get_client() -> GeminiClient:
+    """Create the AI client on first use, so each worker builds its own gRPC channel after fork."""
+    return GeminiClient()
+
+
+def ojson(payload, status=200):
+    """Serialize payload with orjson into a JSON response."""
+    return Response(orjson.dumps(payload), status=status, mimetype="application/json")
+
+
+def read_message():
+    """Validate the request body; return (message, None) or (None, error response)."""
+    raw = request.get_data(cache=False, as_text=False)
+    if len(raw) > MAX_BODY_BYTES:
+        return None, ojson({"success": False, "error": "Message too large."}, 413)
+
+    try:
+        payload = orjson.loads(raw) if raw else {}
+    except orjson.JSONDecodeError:
+        payload = {}
+    message = payload.get("message", "") if isinstance(payload, dict) else ""
+    user_message = message.strip() if isinstance(message, str) else ""
+
+    if not user_message:
+        logger.warning("Empty message received.")
+        return None, ojson({"success": False, "error": "No message provided."}, 400)
+    if len(user_message) > MAX_MESSAGE_CHARS:
+        logger.warning("Oversized message rejected (%d chars).", len(user_message))
+        return None, ojson({"success": False, "error": "Message too large."}, 413)
+    return user_message, None
 
-# Initialize AI client
-client = GeminiClient()
 
 # -------------------------------------------------------
 # Routes
@@ -48,33 +137,51 @@ client = GeminiClient()
 
 @app.route("/")
 def index():
-    """Render homepage (basic chat UI)."""
-    return render_template("index.html")
+    """Serve homepage (basic chat UI); the page has no template variables, so skip Jinja."""
+    return send_from_directory(_PAGES_DIR, "index.html", conditional=True, max_age=3600)
 
 
 @app.route("/api/chat", methods=["POST"])
 def chat():
     """Handle chat messages sent from the frontend."""
-    payload = request.get_json(silent=True) or {}
-    user_message = payload.get("message", "").strip()
-
-    if not user_message:
-        logger.warning("Empty message received.")
-        return jsonify({"success": False, "error": "No message provided."}), 400
+    user_message, error = read_message()
+    if error:
+        return error
 
     try:
-        response_data = client.generate_response(user_message)
+        response_data = get_client().generate_response(user_message)
 
         # In case response is a dict from GeminiClient
         if isinstance(response_data, dict):
-            return jsonify({"success": True, "response": response_data.get("response", "")})
+            return ojson({"success": True, "response": response_data.get("response", "")})
 
         # Fallback (if GeminiClient returned raw string)
-        return jsonify({"success": True, "response": response_data})
+        return ojson({"success": True, "response": response_data})
 
     except Exception as e:
-        logger.error(f"Error generating response: {e}")
-        return jsonify({"success": False, "error": "Error generating response."}), 500
+        logger.error("Error generating response: %s", e)
+        return ojson({"success": False, "error": "Error generating response."}, 500)
+
+
+@app.route("/api/chat/stream", methods=["POST"])
+def chat_stream():
+    """Stream the AI response to the frontend as Server-Sent Events."""
+    user_message, error = read_message()
+    if error:
+        return error
+
+    def events():
+        # Let the WSGI server batch writes; never flush per token.
+        for chunk in get_client().generate_response_stream(user_message):
+            yield b"data: " + orjson.dumps({"text": chunk}) + b"\n\n"
+
+    return Response(stream_with_context(events()), mimetype="text/event-stream")
+
+
+@app.errorhandler(413)
+def payload_too_large(_error):
+    """Answer Werkzeug's MAX_CONTENT_LENGTH rejection with the usual JSON shape."""
+    return ojson({"success": False, "error": "Message too large."}, 413)
 
 
 # -------------------------------------------------------
@@ -84,7 +191,7 @@ if __name__ == "__main__":
     port = int(os.getenv("PORT", 5000))
     debug_mode = os.getenv("DEBUG", "true").lower() == "true"
 
-    logger.info(f"🚀 Starting Flask app on port {port} (debug={debug_mode})")
+    logger.info("🚀 Starting Flask app on port %s (debug=%s)", port, debug_mode)
     app.run(host="0.0.0.0", port=port, debug=debug_mode)
 
 # -------------------------------------------------------
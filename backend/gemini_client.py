@@ -14,106 +14,365 @@ Version: 1.0.0
 Date: October 2025
 """
 
+import io
 import os
+import hashlib
+import re
+import atexit
 import logging
-from typing import List, Dict, Union
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+import numpy as np
+from cachetools import TTLCache
 from dotenv import load_dotenv
+from pythonjsonlogger.json import JsonFormatter
 from ddgs import DDGS
 import google.generativeai as genai
+import shared_cache
 
 # Silence gRPC warnings
 os.environ["GRPC_VERBOSITY"] = "ERROR"
 os.environ["GRPC_LOG_SEVERITY_LEVEL"] = "ERROR"
 
 # Setup logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(message)s",
-    datefmt="%Y-%m-%d %H:%M:%S"
+_log_handler = logging.StreamHandler()
+_log_handler.setFormatter(
+    JsonFormatter("%(asctime)s %(levelname)s %(message)s", datefmt="%Y-%m-%d %H:%M:%S")
 )
+logging.basicConfig(level=logging.INFO, handlers=[_log_handler])
 logger = logging.getLogger(__name__)
 
 load_dotenv()
 
+# Recent search results, keyed on (normalized query, max_results)
+_search_cache: TTLCache = TTLCache(maxsize=512, ttl=600)
+_search_cache_lock = threading.Lock()
+_search_cache_stats = {"hits": 0, "misses": 0}
+
+def _native_thread_pool(max_workers: int, name: str):
+    """Thread pool whose workers are real OS threads, even after gevent's monkey.patch_all()."""
+    # ddgs does HTTP through primp (Rust), which gevent cannot make cooperative; run on the
+    # hub and a search would freeze every greenlet in the worker until it returns.
+    from gevent import monkey
+    if monkey.is_module_patched("threading"):
+        from gevent.threadpool import ThreadPoolExecutor as NativeThreadPoolExecutor
+        return NativeThreadPoolExecutor(max_workers=max_workers)
+    return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+
+# Search backends raced on every query; the first full page of results wins
+SEARCH_BACKENDS = ("duckduckgo", "auto")
+
+# One DDGS session per (backend, OS thread): connections stay warm, no session is ever shared,
+# and a straggling backend only ties up its own pool thread, never a lock later searches need
+_ddgs_sessions: Dict[Tuple[str, int], DDGS] = {}
+_search_pool = _native_thread_pool(4 * len(SEARCH_BACKENDS), "ddgs")
+
+@atexit.register
+def _close_ddgs_sessions() -> None:
+    for session in list(_ddgs_sessions.values()):
+        session.__exit__(None, None, None)
+
+def _search_backend(backend: str, query: str, max_results: int) -> List[Dict[str, str]]:
+    """Run one backend's text search and keep results that have a title and link."""
+    key = (backend, threading.get_native_id())
+    session = _ddgs_sessions.get(key) or _ddgs_sessions.setdefault(key, DDGS())
+    try:
+        raw_results = list(session.text(query, max_results=max_results, backend=backend))
+    except Exception as e:
+        logger.warning("Search backend %s failed: %s", backend, e)
+        return []
+
+    # ddgs.text always yields dicts, so fill a pre-sized list without type checks
+    slots: List[Optional[Dict[str, str]]] = [None] * max_results
+    n = 0
+    for result in raw_results:
+        title = result.get("title")
+        href = result.get("href")
+        if title and href:
+            slots[n] = {"title": title, "href": href, "body": result.get("body", "")}
+            n += 1
+            if n == max_results:
+                break
+    return slots[:n]
+
+def _race_backends(query: str, max_results: int) -> List[Dict[str, str]]:
+    """Query every backend at once; return the first full result set, else the largest."""
+    futures = [_search_pool.submit(_search_backend, backend, query, max_results) for backend in SEARCH_BACKENDS]
+    best: List[Dict[str, str]] = []
+    try:
+        for future in as_completed(futures):
+            results = future.result()
+            if len(results) >= max_results:
+                return results
+            if len(results) > len(best):
+                best = results
+        return best
+    finally:
+        # Drops backends that have not started; a running one finishes on its own thread
+        for future in futures:
+            future.cancel()
+
 def perform_web_search(query: str, max_results: int = 6) -> List[Dict[str, str]]:
     """Perform a DuckDuckGo search and return a list of results."""
-    results: List[Dict[str, str]] = []
+    key = (query.strip().casefold(), max_results)
+    with _search_cache_lock:
+        cached = _search_cache.get(key)
+        if cached is not None:
+            _search_cache_stats["hits"] += 1
+            logger.info("Search cache hit (%d hits, %d misses)", _search_cache_stats["hits"], _search_cache_stats["misses"])
+            return cached
+        _search_cache_stats["misses"] += 1
+
     try:
-        with DDGS() as ddgs:
-            for result in ddgs.text(query, max_results=max_results):
-                if not isinstance(result, dict):
-                    continue
-                title = result.get("title", "")
-                href = result.get("href", "")
-                body = result.get("body", "")
-                if title and href:
-                    results.append({"title": title, "href": href, "body": body})
+        # Results another worker already fetched
+        shared_key = shared_cache.make_key("ddg:v1", *key)
+        shared = shared_cache.cache_get(shared_key)
+        if shared:
+            with _search_cache_lock:
+                _search_cache[key] = shared
+            return shared
+
+        results = _race_backends(query, max_results)
+        if results:
+            with _search_cache_lock:
+                _search_cache[key] = results
+            shared_cache.cache_set(shared_key, results, ttl=3600)
         return results
     except Exception as e:
-        logger.error(f"DuckDuckGo search error: {e}")
+        logger.error("DuckDuckGo search error: %s", e)
         return []
 
+# Matches "search: <query>" or "/search <query>" and captures the query
+_SEARCH_RE = re.compile(r"^\s*(?:search:|/search\s)\s*(\S.*?)\s*$", re.IGNORECASE | re.DOTALL)
+
+# Composed research prompts, keyed on (search query, result hrefs)
+_composed_cache: TTLCache = TTLCache(maxsize=256, ttl=600)
+_composed_cache_lock = threading.Lock()
+
+SYSTEM_PROMPT = (
+    "You are an AI research assistant. Use the provided web results to answer the user query. "
+    "Cite sources inline like [1], [2], and include a concise summary."
+)
+
+# Semantic response cache settings
+EMBEDDING_MODEL = "models/text-embedding-004"
+SEMANTIC_CACHE_SIZE = 200
+SEMANTIC_CACHE_THRESHOLD = 0.95
+
+# Short chat prompts repeat often enough to be worth sharing across workers
+SHARED_REPLY_MAX_CHARS = 256
+
 class GeminiClient:
     """Manages interaction with Google Gemini API and handles intelligent responses."""
 
     def __init__(self):
+        # (unit embedding, conversation state, response) entries; _sem_matrix stacks the
+        # embeddings row by row and _sem_states holds the matching states
+        self._sem_cache: List[Tuple[np.ndarray, str, str]] = []
+        self._sem_matrix: Optional[np.ndarray] = None
+        self._sem_states: Optional[np.ndarray] = None
+        self._sem_lock = threading.Lock()
+        self._chat_lock = threading.Lock()
+        # Serializes use of the one ChatSession; a stream holds it until its last chunk
+        self._session_lock = threading.RLock()
+        self.model = None
+        self.chat = None
         try:
             api_key = os.getenv("GEMINI_API_KEY")
             if not api_key:
                 raise EnvironmentError("❌ GEMINI_API_KEY not found in environment variables.")
             genai.configure(api_key=api_key)
             self.model = genai.GenerativeModel("models/gemini-2.5-flash")
-            self.chat = self.model.start_chat(history=[])
             logger.info("✅ GeminiClient initialized successfully.")
         except Exception as e:
-            logger.error(f"Error configuring Gemini API: {e}")
-            self.chat = None
+            logger.error("Error configuring Gemini API: %s", e)
+            self.model = None
+
+    def _ensure_chat(self):
+        """Start the chat session on first use; a no-op once it exists."""
+        with self._chat_lock:
+            if self.chat is None:
+                self.chat = self.model.start_chat(history=[])
+            return self.chat
+
+    def _embed(self, text: str) -> Optional[np.ndarray]:
+        """Return the unit-normalized embedding of text, or None if it cannot be computed."""
+        try:
+            result = genai.embed_content(model=EMBEDDING_MODEL, content=text)
+            vec = np.asarray(result["embedding"], dtype=np.float32)
+            norm = np.linalg.norm(vec)
+            return vec / norm if norm else None
+        except Exception as e:
+            logger.warning("Embedding error, skipping semantic cache: %s", e)
+            return None
+
+    def _shared_reply_key(self, state: str, text: str) -> Optional[str]:
+        """Key for the cross-worker reply cache, or None when text is too long to be worth it."""
+        if len(text) >= SHARED_REPLY_MAX_CHARS:
+            return None
+        return shared_cache.make_key("gemini:v2", state, text)
+
+    def _history_state(self) -> str:
+        """Fingerprint of the conversation so far: turn count plus a hash of the last exchange."""
+        with self._session_lock:
+            history = self.chat.history
+        tail = "\x1f".join(part.text for content in history[-2:] for part in content.parts)
+        return f"{len(history)}:{hashlib.sha1(tail.encode('utf-8')).hexdigest()}"
+
+    def _record_cached_turn(self, prompt: str, reply: str) -> None:
+        """Append a cache-served exchange to the chat history so the model sees what the user saw."""
+        with self._session_lock:
+            self.chat.history = [
+                *self.chat.history,
+                {"role": "user", "parts": [prompt]},
+                {"role": "model", "parts": [reply]},
+            ]
+
+    def _semantic_lookup(self, vec: np.ndarray, state: str) -> Optional[str]:
+        """Return a cached response for a similar prompt asked at the same conversation state."""
+        with self._sem_lock:
+            if self._sem_matrix is None:
+                return None
+            scores = np.where(self._sem_states == state, np.dot(self._sem_matrix, vec), -1.0)
+            best = int(np.argmax(scores))
+            if scores[best] >= SEMANTIC_CACHE_THRESHOLD:
+                return self._sem_cache[best][2]
+        return None
+
+    def _semantic_store(self, vec: np.ndarray, state: str, response: str) -> None:
+        """Remember a response, evicting the oldest entry once the cache is full."""
+        with self._sem_lock:
+            self._sem_cache.append((vec, state, response))
+            if len(self._sem_cache) > SEMANTIC_CACHE_SIZE:
+                self._sem_cache.pop(0)
+            self._sem_matrix = np.vstack([v for v, _, _ in self._sem_cache])
+            self._sem_states = np.array([st for _, st, _ in self._sem_cache], dtype=object)
+
+    def _parse_input(self, user_input: str) -> Tuple[str, Optional[str]]:
+        """Split the input into the chat text and the search query, if triggered."""
+        # Detect search trigger
+        m = _SEARCH_RE.match(user_input)
+        search_query = m.group(1) if m else None
+        return user_input.strip(), search_query
+
+    def _compose_search_prompt(self, search_query: str, web_results: List[Dict[str, str]]) -> str:
+        """Compose the research prompt from the query and its web results."""
+        ck = (search_query, tuple(r["href"] for r in web_results))
+        with _composed_cache_lock:
+            cached = _composed_cache.get(ck)
+        if cached is not None:
+            return cached
+
+        # Write each reference straight into one buffer instead of joining a throwaway list
+        buf = io.StringIO()
+        for i, r in enumerate(web_results):
+            if i:
+                buf.write("\n\n")
+            buf.write(f"[{i + 1}] {r['title']} — {r['href']}\n{r['body']}")
+        refs_block = buf.getvalue()
+        composed = (
+            f"<system>\n{SYSTEM_PROMPT}\n</system>\n"
+            f"<user_query>\n{search_query}\n</user_query>\n"
+            f"<web_results>\n{refs_block}\n</web_results>"
+        )
+        with _composed_cache_lock:
+            _composed_cache[ck] = composed
+        return composed
+
+    def _prepare(self, user_input: str) -> Dict[str, Any]:
+        """Resolve the prompt for either response path, answering from a cache when possible."""
+        text, search_query = self._parse_input(user_input)
+
+        # Perform search if triggered
+        if search_query:
+            self._ensure_chat()
+            web_results = perform_web_search(search_query, 6)
+            if not web_results:
+                return {"mode": "web_search", "query": search_query, "error": "Could not retrieve web results."}
+            return {"mode": "web_search", "query": search_query, "prompt": self._compose_search_prompt(search_query, web_results)}
+
+        # Default chat, answered from the shared or semantic cache when possible.
+        # Replies depend on the conversation, so only reuse one given at the same state.
+        self._ensure_chat()
+        state = self._history_state()
+        shared_key = self._shared_reply_key(state, text)
+        shared = shared_cache.cache_get(shared_key) if shared_key else None
+        if shared is not None:
+            self._record_cached_turn(text, shared)
+            return {"mode": "chat_cached", "reply": shared}
+
+        vec = self._embed(text)
+        if vec is not None:
+            cached = self._semantic_lookup(vec, state)
+            if cached is not None:
+                self._record_cached_turn(text, cached)
+                return {"mode": "chat_cached", "reply": cached}
+        return {"mode": "chat", "prompt": text, "vec": vec, "state": state, "shared_key": shared_key}
+
+    def _remember(self, prepared: Dict[str, Any], reply: str) -> None:
+        """Store a fresh chat reply in the semantic and shared caches."""
+        if prepared.get("vec") is not None:
+            self._semantic_store(prepared["vec"], prepared["state"], reply)
+        if prepared.get("shared_key"):
+            shared_cache.cache_set(prepared["shared_key"], reply, ttl=3600)
 
     def generate_response(self, user_input: str) -> Union[str, Dict[str, str]]:
         """Generate an AI response with optional web search when prefixed."""
-        if not self.chat:
+        if not self.model:
             return "AI service is not configured correctly."
 
         try:
-            text = user_input.strip()
-            lower = text.lower()
-
-            # Detect search trigger
-            search_query = None
-            if lower.startswith("search:"):
-                search_query = text.split(":", 1)[1].strip()
-            elif lower.startswith("/search "):
-                search_query = text.split(" ", 1)[1].strip()
-
-            # Perform search if triggered
-            if search_query:
-                web_results = perform_web_search(search_query, max_results=6)
-                if not web_results:
-                    return {"success": False, "response": "Could not retrieve web results."}
-
-                refs_block = "\n\n".join(
-                    [f"[{i+1}] {r['title']} — {r['href']}\n{r['body']}" for i, r in enumerate(web_results)]
-                )
-                system_prompt = (
-                    "You are an AI research assistant. Use the provided web results to answer the user query. "
-                    "Cite sources inline like [1], [2], and include a concise summary."
-                )
-                composed = (
-                    f"<system>\n{system_prompt}\n</system>\n"
-                    f"<user_query>\n{search_query}\n</user_query>\n"
-                    f"<web_results>\n{refs_block}\n</web_results>"
-                )
-
-                response = self.chat.send_message(composed)
-                return {"success": True, "mode": "web_search", "query": search_query, "response": response.text.strip()}
-
-            # Default chat
-            response = self.chat.send_message(text)
-            return {"success": True, "mode": "chat", "response": response.text.strip()}
+            prepared = self._prepare(user_input)
+            if "error" in prepared:
+                return {"success": False, "response": prepared["error"]}
+            if prepared["mode"] == "chat_cached":
+                return {"success": True, "mode": "chat_cached", "response": prepared["reply"]}
+
+            with self._session_lock:
+                response = self.chat.send_message(prepared["prompt"])
+            reply = response.text.strip()
+            self._remember(prepared, reply)
+            if prepared["mode"] == "web_search":
+                return {"success": True, "mode": "web_search", "query": prepared["query"], "response": reply}
+            return {"success": True, "mode": "chat", "response": reply}
         except Exception as e:
-            logger.error(f"Error generating response: {e}")
+            logger.error("Error generating response: %s", e)
             return {"success": False, "response": "An error occurred while processing your request."}
 
+    def generate_response_stream(self, user_input: str) -> Iterator[str]:
+        """Yield the AI response chunk by chunk as Gemini produces it."""
+        if not self.model:
+            yield "AI service is not configured correctly."
+            return
+
+        try:
+            prepared = self._prepare(user_input)
+            if "error" in prepared:
+                yield prepared["error"]
+                return
+            if prepared["mode"] == "chat_cached":
+                yield prepared["reply"]
+                return
+
+            parts: List[str] = []
+            with self._session_lock:
+                # A stream dropped or failing midway leaves the session unusable; roll it back
+                history = list(self.chat.history)
+                finished = False
+                try:
+                    for chunk in self.chat.send_message(prepared["prompt"], stream=True):
+                        if chunk.text:
+                            parts.append(chunk.text)
+                            yield chunk.text
+                    finished = True
+                finally:
+                    if not finished:
+                        self.chat.history = history
+            self._remember(prepared, "".join(parts).strip())
+        except Exception as e:
+            logger.error("Error streaming response: %s", e)
+            yield "An error occurred while processing your request."
 
 if __name__ == "__main__":
     client = GeminiClient()
@@ -0,0 +1,21 @@
+"""
+gunicorn.conf.py
+----------------
+Gunicorn settings for serving wsgi:app with gevent workers.
+
+Author: Osondu Mgbemena
+Version: 1.0.0
+Date: October 2025
+"""
+
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', 5000)}"
+worker_class = "gevent"
+worker_connections = int(os.getenv("WORKER_CONNECTIONS", 1000))
+
+# One worker by default. Each worker process holds its own GeminiClient and chat history,
+# so with several workers consecutive messages from one browser land on different
+# processes and the model loses the conversation. Concurrency comes from
+# worker_connections instead. Raising WEB_CONCURRENCY trades that context for CPU headroom.
+workers = int(os.getenv("WEB_CONCURRENCY", 1))
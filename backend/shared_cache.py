@@ -0,0 +1,98 @@
+"""
+shared_cache.py
+---------------
+Optional Redis cache shared by every worker process.
+
+Features:
+- Connects lazily using REDIS_URL; disabled entirely when it is unset.
+- Stores values as orjson with a per-key expiry (SETEX).
+- Any Redis failure degrades to a cache miss so callers fall back to their local path.
+- After a failure Redis is skipped for BREAKER_SECONDS instead of timing out on every call.
+
+Run Redis with `maxmemory-policy allkeys-lru` so it evicts like the in-process caches.
+
+Author: Osondu Mgbemena
+Version: 1.0.0
+Date: October 2025
+"""
+
+import os
+import hashlib
+import logging
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Optional
+import orjson
+import redis
+
+logger = logging.getLogger(__name__)
+
+# Seconds to bypass Redis after an error before trying it again
+BREAKER_SECONDS = 30.0
+_tripped_at: Optional[float] = None
+_breaker_lock = threading.Lock()
+
+
+def make_key(namespace: str, *parts: Any) -> str:
+    """Build a fixed-length key like 'ddg:v1:<sha1>' from arbitrary parts."""
+    digest = hashlib.sha1("\x1f".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+    return f"{namespace}:{digest}"
+
+
+@lru_cache(maxsize=1)
+def get_redis() -> Optional[redis.Redis]:
+    """Return the Redis client, or None when REDIS_URL is not configured."""
+    url = os.getenv("REDIS_URL")
+    if not url:
+        return None
+    try:
+        # Short timeouts: a slow or missing Redis must never cost more than the work it saves.
+        return redis.Redis.from_url(url, socket_timeout=0.1, socket_connect_timeout=0.1)
+    except ValueError as e:
+        logger.error("Invalid REDIS_URL, shared cache disabled: %s", e)
+        return None
+
+
+def _client() -> Optional[redis.Redis]:
+    """Return the Redis client, or None when it is disabled or the breaker is open."""
+    if _tripped_at is not None and time.monotonic() - _tripped_at < BREAKER_SECONDS:
+        return None
+    return get_redis()
+
+
+def _trip(action: str, e: redis.RedisError) -> None:
+    """Open the breaker, logging only when it was not already open."""
+    global _tripped_at
+    with _breaker_lock:
+        now = time.monotonic()
+        already_open = _tripped_at is not None and now - _tripped_at < BREAKER_SECONDS
+        _tripped_at = now
+    if not already_open:
+        logger.warning("Redis %s failed, bypassing shared cache for %.0fs: %s", action, BREAKER_SECONDS, e)
+
+
+def cache_get(key: str) -> Optional[Any]:
+    """Fetch and decode a cached value; None on miss or Redis error."""
+    client = _client()
+    if client is None:
+        return None
+    try:
+        raw = client.get(key)
+        return orjson.loads(raw) if raw is not None else None
+    except redis.RedisError as e:
+        _trip("read", e)
+    except orjson.JSONDecodeError as e:
+        logger.warning("Ignoring undecodable Redis value for %s: %s", key, e)
+    return None
+
+
+def cache_set(key: str, value: Any, ttl: int = 3600) -> None:
+    """Store a value with an expiry; Redis errors are logged and ignored."""
+    client = _client()
+    if client is None:
+        return
+    try:
+        client.setex(key, ttl, orjson.dumps(value))
+    except redis.RedisError as e:
+        _trip("write", e)
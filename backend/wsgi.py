@@ -0,0 +1,30 @@
+"""
+wsgi.py
+-------
+Production entry point for the Flask app.
+
+Run with gunicorn gevent workers so concurrent requests can overlap
+the Gemini RPCs and DuckDuckGo round-trips instead of queueing:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+For local development keep using `python app.py` (Werkzeug dev server).
+
+Author: Osondu Mgbemena
+Version: 1.0.0
+Date: October 2025
+"""
+
+# Patch sockets before anything else imports them so requests/redis become cooperative.
+# ddgs is not: its primp (Rust) HTTP client bypasses Python sockets, so gemini_client
+# runs searches on native OS threads instead of on the gevent hub.
+from gevent import monkey
+monkey.patch_all()
+
+# gRPC (used by google.generativeai) needs its own hook to yield to the gevent hub.
+from grpc.experimental import gevent as grpc_gevent
+grpc_gevent.init_gevent()
+
+from app import app  # noqa: E402
+
+__all__ = ["app"]